@@ -1,48 +1,110 @@
+import os
 import re
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
 
-from sqlalchemy import Column
+from sqlalchemy import Column, Index
 from sqlmodel import Field, SQLModel
 from sqlalchemy.dialects.sqlite import JSON
 from sqlalchemy.ext.declarative import declared_attr
-from typing import Optional
+from typing import Optional, Iterator
 import uuid
 from sqlalchemy.types import TypeDecorator, String
 
 from .enums import ResourceType, ResourceStatus
 
+_CAMEL_CASE_BOUNDARY = re.compile(r"(?<!^)(?=[A-Z])")
+
+
+class _UUIDPool:
+    """Hands out uuid4 values cut from one os.urandom read per batch instead of one read per id."""
+
+    def __init__(self, size: int = 256):
+        self._size = size
+        self._uuids: deque[uuid.UUID] = deque()
+        self._lock = threading.Lock()
+
+    def next(self) -> uuid.UUID:
+        while True:
+            try:
+                return self._uuids.popleft()
+            except IndexError:
+                self._fill()
+
+    def _reset_after_fork(self) -> None:
+        # The parent may have forked while another thread held the lock, so the child needs a fresh one.
+        self._lock = threading.Lock()
+        self._uuids.clear()
+
+    def _fill(self) -> None:
+        with self._lock:
+            if self._uuids:
+                return
+            buf = os.urandom(16 * self._size)
+            self._uuids.extend(uuid.UUID(bytes=buf[i : i + 16], version=4) for i in range(0, len(buf), 16))
+
+
+_uuid_pool = _UUIDPool()
+# A forked child must not hand out the ids its parent already pre-generated.
+os.register_at_fork(after_in_child=_uuid_pool._reset_after_fork)
+
+generate_uuid = _uuid_pool.next
+
+# Timestamp shared by every row written inside one BaseRepo.transaction().
+_transaction_now: ContextVar[datetime | None] = ContextVar("_transaction_now", default=None)
+
+
+def now() -> datetime:
+    return _transaction_now.get() or datetime.now()
+
+
+@contextmanager
+def transaction_clock() -> Iterator[datetime]:
+    timestamp = datetime.now()
+    token = _transaction_now.set(timestamp)
+    try:
+        yield timestamp
+    finally:
+        _transaction_now.reset(token)
+
 
 class UUIDString(TypeDecorator):
     impl = String(36)
+    cache_ok = True
 
     def process_bind_param(self, value, dialect):
         if value is not None:
             return str(value)
         return value
 
-    def process_result_value(self, value, dialect):
-        return value
+    # No process_result_value: ids come back as the stored strings, and leaving it
+    # undefined keeps SQLAlchemy from adding a per-cell result processor.
 
 
 class BaseTable(SQLModel):
     updated_at: datetime | None = None
-    created_at: datetime = Field(default_factory=datetime.now)
+    created_at: datetime = Field(default_factory=now)
 
     @declared_attr  # type: ignore
     def __tablename__(cls) -> str:
-        name = cls.__name__
-        name = re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
-        name += "s"
+        name = cls.__dict__.get("_cached_tablename")
+        if name is None:
+            name = _CAMEL_CASE_BOUNDARY.sub("_", cls.__name__).lower()
+            name += "s"
+            cls._cached_tablename = name
 
         return name
 
 
 class BaseOrganizationTable(BaseTable):
-    organization_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=uuid.uuid4, primary_key=True)
+    organization_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=generate_uuid, primary_key=True)
 
 
 class User(BaseTable, table=True):
-    user_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=uuid.uuid4, primary_key=True)
+    user_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=generate_uuid, primary_key=True)
     first_name: str
     last_name: str
     phone: str = "doesnt matter"
@@ -62,7 +124,7 @@ class OrganizationUser(BaseOrganizationTable, table=True):
 
 
 class Collection(BaseOrganizationTable, table=True):
-    collection_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=uuid.uuid4, primary_key=True)
+    collection_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=generate_uuid, primary_key=True)
     name: str
     color_code: str = "#000000"
     description: Optional[str] = None
@@ -74,7 +136,7 @@ class CollectionResource(BaseOrganizationTable, table=True):
 
 
 class Resource(BaseOrganizationTable, table=True):
-    resource_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=uuid.uuid4, primary_key=True)
+    resource_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=generate_uuid, primary_key=True)
     source_entity_type: ResourceType
     source_entity_id: uuid.UUID = Field(sa_type=UUIDString)
     status: ResourceStatus = ResourceStatus.pending
@@ -83,7 +145,7 @@ class Resource(BaseOrganizationTable, table=True):
 
 
 class File(BaseOrganizationTable, table=True):
-    file_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=uuid.uuid4, primary_key=True)
+    file_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=generate_uuid, primary_key=True)
     resource_id: uuid.UUID = Field(sa_type=UUIDString)
     name: str
     path: str
@@ -93,7 +155,7 @@ class File(BaseOrganizationTable, table=True):
 
 
 class Meeting(BaseOrganizationTable, table=True):
-    meeting_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=uuid.uuid4, primary_key=True)
+    meeting_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=generate_uuid, primary_key=True)
     resource_id: uuid.UUID = Field(
         sa_type=UUIDString
     )
@@ -102,7 +164,7 @@ class Meeting(BaseOrganizationTable, table=True):
     provider_meeting_url: str | None = None
     provider: str = "doesnt matter"
     status: str = "pending"
-    status_updated_at: datetime = Field(default_factory=datetime.now)
+    status_updated_at: datetime = Field(default_factory=now)
     transcriptions: str | None = None
     user_id: uuid.UUID = Field(
         sa_type=UUIDString
@@ -119,7 +181,7 @@ class MeetingParticipant(BaseOrganizationTable, table=True):
 
 class MeetingRecording(BaseOrganizationTable, table=True):
     meeting_id: uuid.UUID = Field(sa_type=UUIDString, primary_key=True)
-    recording_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=uuid.uuid4, primary_key=True)
+    recording_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=generate_uuid, primary_key=True)
     participant_id: uuid.UUID | None = Field()
     file_id: uuid.UUID = Field(
         sa_type=UUIDString
@@ -131,7 +193,7 @@ class MeetingRecording(BaseOrganizationTable, table=True):
 
 
 class Website(BaseOrganizationTable, table=True):
-    website_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=uuid.uuid4, primary_key=True)
+    website_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=generate_uuid, primary_key=True)
     resource_id: uuid.UUID = Field(
         sa_type=UUIDString
     )
@@ -144,7 +206,7 @@ class Website(BaseOrganizationTable, table=True):
 
 
 class Chat(BaseOrganizationTable, table=True):
-    chat_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=uuid.uuid4, primary_key=True)
+    chat_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=generate_uuid, primary_key=True)
     owner_user_id: uuid.UUID = Field(
         sa_type=UUIDString
     )
@@ -172,8 +234,14 @@ class ChatResource(BaseOrganizationTable, table=True):
 
 
 class ChatMessage(BaseOrganizationTable, table=True):
+    __table_args__ = (
+        Index("ix_chat_messages_chat_id_created_at_message_id", "chat_id", "created_at", "message_id"),
+    )
+
+    # Chat history is ordered by created_at, so messages always take the real clock, not the transaction one.
+    created_at: datetime = Field(default_factory=datetime.now)
     chat_id: uuid.UUID = Field(sa_type=UUIDString, primary_key=True)
-    message_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=uuid.uuid4, primary_key=True)
+    message_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=generate_uuid, primary_key=True)
     user_id: uuid.UUID | None = Field(sa_type=UUIDString)
     type: str
     content: str
@@ -181,7 +249,7 @@ class ChatMessage(BaseOrganizationTable, table=True):
     is_summarized: bool = False
 
 class Assistant(BaseOrganizationTable, table=True):
-    assistant_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=uuid.uuid4, primary_key=True)
+    assistant_id: uuid.UUID = Field(sa_type=UUIDString, default_factory=generate_uuid, primary_key=True)
     purpose: str
     instructions: str
     ai_model: str
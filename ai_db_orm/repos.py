@@ -1,9 +1,14 @@
+import asyncio
+import functools
 import uuid
-from typing import TypeVar, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, ClassVar, Generic, TypeVar, Sequence, Iterator
 
-from sqlalchemy import create_engine, Select, Engine
+from sqlalchemy import and_, create_engine, insert, or_, update, Select, Update, Engine
+from sqlalchemy.orm import aliased
 from sqlmodel import Session, select, SQLModel
-from google.cloud.sqlalchemy_spanner import SpannerDialect
 
 from .models import (
     User,
@@ -21,94 +26,218 @@ from .models import (
     ChatMessage,
     ResourceType,
     Website, Assistant,
+    generate_uuid,
+    transaction_clock,
 )
 from .settings import db_settings
 
 M = TypeVar("M", bound=SQLModel)
+R = TypeVar("R", bound="BaseRepo")
 
+# Sessions opened by BaseRepo.transaction(), one per engine; repo writes join the session of their own engine
+# instead of committing. The dict is copied on every change and never mutated in place.
+_transaction_sessions: ContextVar[dict[Engine, Session]] = ContextVar("_transaction_sessions", default={})
 
-class CustomSpannerDialect(SpannerDialect):
-    supports_native_uuid = True
+
+@functools.cache
+def _get_dialect_class() -> type:
+    # The Spanner dialect pulls in the whole gRPC client, so it is only imported once the first engine is built.
+    from google.cloud.sqlalchemy_spanner import SpannerDialect
+
+    class CustomSpannerDialect(SpannerDialect):
+        supports_native_uuid = True
+        # The Spanner client already decodes JSON columns into JsonObject, don't copy every value into a new one.
+        _json_deserializer = staticmethod(lambda value: value)
+
+    return CustomSpannerDialect
+
+
+def __getattr__(name: str):
+    if name == "CustomSpannerDialect":
+        return _get_dialect_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@functools.cache
+def _get_engine(database_url: str) -> Engine:
+    # One pooled engine per database for the whole process, shared by every repo instance.
+    dialect_class = _get_dialect_class()
+    engine = create_engine(
+        f"spanner+spanner:///{database_url}",
+        echo=db_settings.SQL_ECHO,
+        dialect=dialect_class(),
+        pool_pre_ping=True,
+        pool_size=25,
+        max_overflow=0,
+    )
+    # create_engine builds its own dialect from the URL, so the custom settings are copied onto it.
+    engine.dialect.supports_native_uuid = dialect_class.supports_native_uuid
+    engine.dialect._json_deserializer = dialect_class._json_deserializer
+    return engine
 
 
 class BaseRepo:
-    engine: Engine
-    database_url: str
-
-    def __init__(self):
-        self.engine = create_engine(
-            f"spanner+spanner:///{self.database_url}",
-            echo=True,
-            dialect=CustomSpannerDialect(),
-        )
-        self.engine.dialect.supports_native_uuid = True
+    database_url: ClassVar[str]
 
-    def _commit_object(self, obj: M) -> M:
-        with Session(self.engine) as session:
+    @property
+    def engine(self) -> Engine:
+        return _get_engine(self.database_url)
+
+    @contextmanager
+    def transaction(self) -> Iterator[Session]:
+        # A nested transaction on the same engine joins the outer one, which commits once at the end.
+        session = self._get_transaction_session()
+        if session is not None:
+            yield session
+            return
+
+        with Session(self.engine, expire_on_commit=False) as session, transaction_clock():
+            token = _transaction_sessions.set({**_transaction_sessions.get(), self.engine: session})
+            try:
+                yield session
+                session.commit()
+            finally:
+                _transaction_sessions.reset(token)
+
+    def _get_transaction_session(self) -> Session | None:
+        return _transaction_sessions.get().get(self.engine)
+
+    def _commit_object(self, obj: M, refresh: bool = False) -> M:
+        session = self._get_transaction_session()
+        if session is not None:
+            session.add(obj)
+            if refresh:
+                session.flush()
+                session.refresh(obj)
+            return obj
+
+        with Session(self.engine, expire_on_commit=False) as session:
             session.add(obj)
             session.commit()
-            session.refresh(obj)
+            # Defaults are filled in client-side, so re-selecting the row is only needed for server-side values.
+            if refresh:
+                session.refresh(obj)
 
         return obj
 
+    def _commit_objects(self, objs: Sequence[M]) -> Sequence[M]:
+        # One executemany INSERT, which the Spanner driver sends as a single batch DML request,
+        # instead of a unit-of-work flush per object.
+        if not objs:
+            return objs
+
+        model = type(objs[0])
+        if any(type(obj) is not model for obj in objs):
+            raise ValueError(f"_commit_objects expects only {model.__name__} objects")
+
+        statement = insert(model)
+        rows = [obj.model_dump() for obj in objs]
+        session = self._get_transaction_session()
+        if session is not None:
+            session.exec(statement, params=rows)
+            return objs
+
+        with Session(self.engine, expire_on_commit=False) as session:
+            session.exec(statement, params=rows)
+            session.commit()
 
-class UserRepo(BaseRepo):
+        return objs
 
-    @property
-    def database_url(self) -> str:
-        return db_settings.SPANNER_USERS_URL
+    def _update_object(self, statement: Update) -> M:
+        # Single UPDATE ... THEN RETURN round-trip instead of select, mutate and flush.
+        session = self._get_transaction_session()
+        if session is not None:
+            return session.scalars(statement).first()
+
+        with Session(self.engine, expire_on_commit=False) as session:
+            obj = session.scalars(statement).first()
+            session.commit()
+
+        return obj
+
+
+class AsyncRepo(Generic[R]):
+    """Awaitable view of a repo: ``await AsyncRepo(ChatRepo()).get_chat(...)`` runs the method in a worker thread."""
+
+    # There is no async Spanner driver, so blocking calls are moved off the event loop instead.
+
+    def __init__(self, repo: R):
+        self._repo = repo
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_") or name == "transaction":
+            raise AttributeError(name)
+
+        attr = getattr(self._repo, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            # to_thread copies the caller's context, which would hand the open transaction session to another thread.
+            if _transaction_sessions.get():
+                raise RuntimeError("AsyncRepo methods cannot be awaited inside BaseRepo.transaction()")
+            return await asyncio.to_thread(attr, *args, **kwargs)
+
+        return call
+
+
+class UserRepo(BaseRepo):
+    database_url: ClassVar[str] = db_settings.SPANNER_USERS_URL
 
     def get_default_user(self) -> User:
         with Session(self.engine) as session:
+            return session.get(User, self._default_user_id())
+
+    # The default rows never change, so their ids are looked up (or created) once per process and each
+    # call loads a fresh instance by primary key. The loaders commit in their own session, ignoring any open
+    # transaction(), so only ids of rows that were actually written get cached.
+    @classmethod
+    @functools.cache
+    def _default_user_id(cls) -> uuid.UUID:
+        with Session(cls().engine, expire_on_commit=False) as session:
             statement: Select = select(User).where(User.first_name == "Default AI", User.last_name == "service user 2")
             user = session.exec(statement).first()
             if not user:
                 user = User(first_name="Default AI", last_name="service user 2")
-                user = self._commit_object(user)
+                session.add(user)
+                session.commit()
 
-            return user
+            return user.user_id
 
 
 class OrganizationRepo(BaseRepo):
-
-    @property
-    def database_url(self) -> str:
-        return db_settings.SPANNER_ORGANIZATION_URL
+    database_url: ClassVar[str] = db_settings.SPANNER_ORGANIZATION_URL
 
     def get_default_organization(self) -> Organization:
         with Session(self.engine) as session:
+            return session.get(Organization, self._default_organization_id())
+
+    @classmethod
+    @functools.cache
+    def _default_organization_id(cls) -> uuid.UUID:
+        user_id = UserRepo._default_user_id()
+        with Session(cls().engine, expire_on_commit=False) as session:
             statement: Select = select(Organization).where(Organization.name == "Default AI service org 2")
             organization = session.exec(statement).first()
             if not organization:
                 organization = Organization(name="Default AI service org 2")
-                organization = self._commit_object(organization)
+                session.add(organization)
 
-            user = UserRepo().get_default_user()
-            statement: Select = select(OrganizationUser).where(OrganizationUser.user_id == user.user_id)
+            statement: Select = select(OrganizationUser).where(OrganizationUser.user_id == user_id)
             organization_user = session.exec(statement).first()
             if not organization_user:
-                organization_user = OrganizationUser(user_id=user.user_id, organization_id=organization.organization_id)
-                self._commit_object(organization_user)
+                organization_user = OrganizationUser(user_id=user_id, organization_id=organization.organization_id)
+                session.add(organization_user)
 
-            return organization
+            session.commit()
+            return organization.organization_id
 
 
 class CollectionRepo(BaseRepo):
-
-    @property
-    def database_url(self) -> str:
-        return db_settings.SPANNER_COLLECTION_URL
-
-    def _commit_object(self, obj):
-        with Session(self.engine) as session:
-            session.add(obj)
-            session.commit()
-            session.refresh(obj)
-
-        return obj
+    database_url: ClassVar[str] = db_settings.SPANNER_COLLECTION_URL
 
     def create_collection(self, organization_id: uuid.UUID, name: str | None = None) -> Collection:
-        name = name if name else f"Collection {uuid.uuid4()}"
+        name = name if name else f"Collection {generate_uuid()}"
         collection = Collection(organization_id=organization_id, name=name)
         return self._commit_object(collection)
 
@@ -120,6 +249,15 @@ class CollectionRepo(BaseRepo):
         )
         return self._commit_object(collection_resource)
 
+    def create_collection_resources(
+        self, collection_id: uuid.UUID, organization_id: uuid.UUID, resource_ids: Sequence[uuid.UUID]
+    ) -> Sequence[CollectionResource]:
+        collection_resources = [
+            CollectionResource(collection_id=collection_id, organization_id=organization_id, resource_id=resource_id)
+            for resource_id in resource_ids
+        ]
+        return self._commit_objects(collection_resources)
+
     def get_collection_resources(self, collection_id: uuid.UUID) -> Sequence[CollectionResource]:
         with Session(self.engine) as session:
             statement: Select = select(CollectionResource).where(CollectionResource.collection_id == collection_id)
@@ -135,10 +273,7 @@ class CollectionRepo(BaseRepo):
 
 
 class ResourceRepo(BaseRepo):
-
-    @property
-    def database_url(self) -> str:
-        return db_settings.SPANNER_RESOURCES_URL
+    database_url: ClassVar[str] = db_settings.SPANNER_RESOURCES_URL
 
     def get_resource(self, resource_id: uuid.UUID) -> Resource:
         with Session(self.engine) as session:
@@ -156,40 +291,38 @@ class ResourceRepo(BaseRepo):
         return resource
 
     def update_resource_status(self, resource_id: uuid.UUID, status: str) -> Resource:
-        with Session(self.engine) as session:
-            statement: Select = select(Resource).where(Resource.resource_id == resource_id)
-            resource = session.exec(statement).first()
-            resource.status = status
-            session.add(resource)
-            session.commit()
-
-        return resource
+        statement: Update = (
+            update(Resource)
+            .where(Resource.resource_id == resource_id)
+            .values(status=status)
+            .returning(Resource)
+        )
+        return self._update_object(statement)
 
     def get_resources_by_collection_id(self, collection_id: uuid.UUID) -> Sequence[Resource]:
-        with Session(self.engine) as session:
-            collection_resources = CollectionRepo().get_collection_resources(collection_id)
+        collection_resources = CollectionRepo().get_collection_resources(collection_id)
+        resource_ids = [collection_resource.resource_id for collection_resource in collection_resources]
+        if not resource_ids:
+            return []
 
-            statement: Select = select(Resource).where(Resource.resource_id == collection_resources[0].resource_id)
+        with Session(self.engine) as session:
+            statement: Select = select(Resource).where(Resource.resource_id.in_(resource_ids))
             resources = session.exec(statement).all()
 
             return resources
 
     def update_resource_ai_summary(self, resource_id: uuid.UUID, ai_summary: str) -> Resource:
-        with Session(self.engine) as session:
-            statement: Select = select(Resource).where(Resource.resource_id == resource_id)
-            resource = session.exec(statement).first()
-            resource.ai_summary = ai_summary
-            session.add(resource)
-            session.commit()
-
-        return resource
+        statement: Update = (
+            update(Resource)
+            .where(Resource.resource_id == resource_id)
+            .values(ai_summary=ai_summary)
+            .returning(Resource)
+        )
+        return self._update_object(statement)
 
 
 class FileRepo(BaseRepo):
-
-    @property
-    def database_url(self) -> str:
-        return db_settings.SPANNER_FILES_URL
+    database_url: ClassVar[str] = db_settings.SPANNER_FILES_URL
 
     def get_file(self, file_id: uuid.UUID) -> File:
         with Session(self.engine) as session:
@@ -234,10 +367,7 @@ class FileRepo(BaseRepo):
 
 
 class MeetingRepo(BaseRepo):
-
-    @property
-    def database_url(self) -> str:
-        return db_settings.SPANNER_MEETINGS_URL
+    database_url: ClassVar[str] = db_settings.SPANNER_MEETINGS_URL
 
     def create_meeting(self, organization: Organization, resource: Resource, user: User) -> Meeting:
         meeting = Meeting(
@@ -275,31 +405,26 @@ class MeetingRepo(BaseRepo):
             return meeting_recording
 
     def update_meeting_transcriptions(self, meeting_id: uuid.UUID, transcriptions: str) -> Meeting:
-        with Session(self.engine) as session:
-            statement: Select = select(Meeting).where(Meeting.meeting_id == meeting_id)
-            meeting = session.exec(statement).first()
-            meeting.transcriptions = transcriptions
-            session.add(meeting)
-            session.commit()
-
-        return meeting
+        statement: Update = (
+            update(Meeting)
+            .where(Meeting.meeting_id == meeting_id)
+            .values(transcriptions=transcriptions)
+            .returning(Meeting)
+        )
+        return self._update_object(statement)
 
     def update_meeting_recordings_transcriptions(self, meeting_id: uuid.UUID, transcriptions: str) -> MeetingRecording:
-        with Session(self.engine) as session:
-            statement: Select = select(MeetingRecording).where(MeetingRecording.meeting_id == meeting_id)
-            meeting_recording = session.exec(statement).first()
-            meeting_recording.transcriptions = transcriptions
-            session.add(meeting_recording)
-            session.commit()
-
-        return meeting_recording
+        statement: Update = (
+            update(MeetingRecording)
+            .where(MeetingRecording.meeting_id == meeting_id)
+            .values(transcriptions=transcriptions)
+            .returning(MeetingRecording)
+        )
+        return self._update_object(statement)
 
 
 class WebsiteRepo(BaseRepo):
-
-    @property
-    def database_url(self) -> str:
-        return db_settings.SPANNER_WEBSITE_URL
+    database_url: ClassVar[str] = db_settings.SPANNER_WEBSITE_URL
 
     def get_website(self, website_id: uuid.UUID) -> Website:
         with Session(self.engine) as session:
@@ -312,7 +437,7 @@ class WebsiteRepo(BaseRepo):
             organization_id=organization.organization_id,
             resource_id=resource.resource_id,
             user_id=user.user_id,
-            name=f"Website {uuid.uuid4()}",
+            name=f"Website {generate_uuid()}",
             website_id=resource.source_entity_id,
             url=url,
         )
@@ -320,43 +445,36 @@ class WebsiteRepo(BaseRepo):
         return website
 
     def update_website_parsed_urls(self, website_id: uuid.UUID, parsed_urls: str) -> Website:
-        with Session(self.engine) as session:
-            statement: Select = select(Website).where(Website.website_id == website_id)
-            website = session.exec(statement).first()
-            website.parsed_urls = parsed_urls
-            session.add(website)
-            session.commit()
-
-        return website
+        statement: Update = (
+            update(Website)
+            .where(Website.website_id == website_id)
+            .values(parsed_urls=parsed_urls)
+            .returning(Website)
+        )
+        return self._update_object(statement)
 
 
 class ChatRepo(BaseRepo):
-
-    @property
-    def database_url(self) -> str:
-        return db_settings.SPANNER_CHAT_URL
+    database_url: ClassVar[str] = db_settings.SPANNER_CHAT_URL
 
     def get_chat(self, chat_id: uuid.UUID, organization_id: uuid.UUID) -> Chat:
         with Session(self.engine) as session:
-            statement: Select = select(Chat).where(Chat.chat_id == chat_id, Chat.organization_id == organization_id)
-            chat = session.exec(statement).first()
+            chat = session.get(Chat, {"organization_id": organization_id, "chat_id": chat_id})
             return chat
 
     def create_chat(self, organization_id: uuid.UUID, user_id: uuid.UUID, type: str, name: str) -> Chat:
-        chat_id = uuid.uuid4()
-        chat = Chat(organization_id=organization_id, owner_user_id=user_id, chat_id=chat_id, type=type, name=name)
+        chat = Chat(organization_id=organization_id, owner_user_id=user_id, type=type, name=name)
         chat = self._commit_object(chat)
         return chat
 
     def update_chat_name(self, chat_id: uuid.UUID, name: str) -> Chat:
-        with Session(self.engine) as session:
-            statement: Select = select(Chat).where(Chat.chat_id == chat_id)
-            chat = session.exec(statement).first()
-            chat.name = name
-            session.add(chat)
-            session.commit()
-
-        return chat
+        statement: Update = (
+            update(Chat)
+            .where(Chat.chat_id == chat_id)
+            .values(name=name)
+            .returning(Chat)
+        )
+        return self._update_object(statement)
 
     def add_resource_to_chat(
         self, organization_id: uuid.UUID, chat_id: uuid.UUID, resource_id: uuid.UUID
@@ -365,6 +483,15 @@ class ChatRepo(BaseRepo):
         chat_resource = self._commit_object(chat_resource)
         return chat_resource
 
+    def add_resources_to_chat(
+        self, organization_id: uuid.UUID, chat_id: uuid.UUID, resource_ids: Sequence[uuid.UUID]
+    ) -> Sequence[ChatResource]:
+        chat_resources = [
+            ChatResource(organization_id=organization_id, chat_id=chat_id, resource_id=resource_id)
+            for resource_id in resource_ids
+        ]
+        return self._commit_objects(chat_resources)
+
     def add_collection_to_chat(
         self, organization_id: uuid.UUID, chat_id: uuid.UUID, collection_id: uuid.UUID
     ) -> ChatCollection:
@@ -394,7 +521,7 @@ class ChatRepo(BaseRepo):
         owner_user_id: uuid.UUID | None = None,
         arguments: dict | None = None,
     ) -> ChatMessage:
-        message_id = message_id or uuid.uuid4()
+        message_id = message_id or generate_uuid()
         chat_message = ChatMessage(
             organization_id=organization_id,
             chat_id=chat_id,
@@ -407,33 +534,49 @@ class ChatRepo(BaseRepo):
         chat_message = self._commit_object(chat_message)
         return chat_message
 
-    def get_chat_messages(self, chat_id: uuid.UUID) -> Sequence[ChatMessage]:
+    def get_chat_messages(
+        self, chat_id: uuid.UUID, before: datetime | None = None, before_id: uuid.UUID | None = None
+    ) -> Sequence[ChatMessage]:
+        # The page cursor is the (created_at, message_id) of the oldest message already shown, since
+        # created_at alone can tie and paging on it would skip messages.
+        if (before is None) != (before_id is None):
+            raise ValueError("before and before_id must be passed together")
+
         with Session(self.engine) as session:
-            statement: Select = (
-                select(ChatMessage)
-                .where(ChatMessage.chat_id == chat_id)
-                .order_by(ChatMessage.created_at.desc())
-                .limit(40)
+            latest: Select = select(ChatMessage).where(ChatMessage.chat_id == chat_id)
+            # Spanner has no row-value comparison, so the tuple check is spelled out.
+            if before is not None:
+                latest = latest.where(
+                    or_(
+                        ChatMessage.created_at < before,
+                        and_(ChatMessage.created_at == before, ChatMessage.message_id < before_id),
+                    )
+                )
+            latest_subquery = (
+                latest.order_by(ChatMessage.created_at.desc(), ChatMessage.message_id.desc()).limit(40).subquery()
+            )
+
+            # Pick the newest 40 messages, then let Spanner return them oldest first. message_id breaks
+            # created_at ties so both orders match the page cursor.
+            latest_message = aliased(ChatMessage, latest_subquery)
+            statement: Select = select(latest_message).order_by(
+                latest_subquery.c.created_at, latest_subquery.c.message_id
             )
             chat_messages = session.exec(statement).all()
-            chat_messages = list(reversed(chat_messages))
             return chat_messages
 
     def add_assistant_to_chat(self, chat_id: uuid.UUID, assistant_id: uuid.UUID) -> Chat:
-        with Session(self.engine) as session:
-            statement: Select = select(Chat).where(Chat.chat_id == chat_id)
-            chat = session.exec(statement).first()
-            chat.assistant_id = assistant_id
-            session.add(chat)
-            session.commit()
-        return chat
+        statement: Update = (
+            update(Chat)
+            .where(Chat.chat_id == chat_id)
+            .values(assistant_id=assistant_id)
+            .returning(Chat)
+        )
+        return self._update_object(statement)
 
 
 class AssistantRepo(BaseRepo):
-
-    @property
-    def database_url(self) -> str:
-        return db_settings.SPANNER_ASSISTANT_URL
+    database_url: ClassVar[str] = db_settings.SPANNER_ASSISTANT_URL
 
     def get_assistant(self, assistant_id: uuid.UUID) -> Assistant:
         with Session(self.engine) as session:
@@ -1,9 +1,9 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Annotated
 
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
-from google.cloud import secretmanager
 
 
 class OnCloud:
@@ -20,9 +20,12 @@ class DBSettings(BaseSettings):
     SPANNER_CHAT_URL: Annotated[str, OnCloud]
     SPANNER_WEBSITE_URL: Annotated[str, OnCloud]
     SPANNER_ASSISTANT_URL: Annotated[str, OnCloud]
+    SQL_ECHO: bool = False
 
 
 def load_secrets(environ: str):
+    from google.cloud import secretmanager
+
     client = secretmanager.SecretManagerServiceClient()
 
     if environ == "production":
@@ -30,11 +33,16 @@ def load_secrets(environ: str):
     else:
         project_id = "zumu-ai-staging"
 
-    for name, field_info in DBSettings.model_fields.items():
-        if OnCloud in field_info.metadata:
-            secret_name = f"projects/{project_id}/secrets/{name.lower()}/versions/latest"
-            response = client.access_secret_version(name=secret_name)
-            secret_data = response.payload.data.decode("UTF-8")
+    def access_secret(name: str) -> str:
+        secret_name = f"projects/{project_id}/secrets/{name.lower()}/versions/latest"
+        response = client.access_secret_version(name=secret_name)
+        return response.payload.data.decode("UTF-8")
+
+    names = [name for name, field_info in DBSettings.model_fields.items() if OnCloud in field_info.metadata]
+
+    # Fetch all secrets concurrently so startup pays one Secret Manager round-trip instead of one per secret.
+    with ThreadPoolExecutor(max_workers=len(names)) as executor:
+        for name, secret_data in zip(names, executor.map(access_secret, names)):
             os.environ[name] = secret_data.strip()
 
 env = os.environ.get("ENV")
@@ -0,0 +1,41 @@
+import os
+
+for _name in (
+    "USERS",
+    "ORGANIZATION",
+    "COLLECTION",
+    "RESOURCES",
+    "FILES",
+    "MEETINGS",
+    "CHAT",
+    "WEBSITE",
+    "ASSISTANT",
+):
+    os.environ.setdefault(f"SPANNER_{_name}_URL", f"projects/test/instances/test/databases/{_name.lower()}")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel
+
+from ai_db_orm import repos
+
+
+@pytest.fixture(autouse=True)
+def sqlite_engines(monkeypatch):
+    """One in-memory SQLite database per repo database URL, standing in for the Spanner databases."""
+    engines = {}
+
+    def get_engine(database_url):
+        if database_url not in engines:
+            engine = create_engine(
+                "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+            )
+            SQLModel.metadata.create_all(engine)
+            engines[database_url] = engine
+        return engines[database_url]
+
+    monkeypatch.setattr(repos, "_get_engine", get_engine)
+    yield engines
+    for engine in engines.values():
+        engine.dispose()
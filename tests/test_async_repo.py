@@ -0,0 +1,43 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy import Engine
+
+from ai_db_orm.repos import AsyncRepo, ChatRepo
+
+
+def test_methods_run_in_worker_threads():
+    repo = ChatRepo()
+    chat = repo.create_chat(uuid.uuid4(), uuid.uuid4(), "chat", "name")
+
+    async def main():
+        async_repo = AsyncRepo(repo)
+        return await asyncio.gather(*(async_repo.get_chat(chat.chat_id, chat.organization_id) for _ in range(5)))
+
+    assert [found.name for found in asyncio.run(main())] == ["name"] * 5
+
+
+def test_non_callable_attributes_are_returned_as_is():
+    repo = ChatRepo()
+
+    assert isinstance(AsyncRepo(repo).engine, Engine)
+    assert AsyncRepo(repo).database_url == repo.database_url
+
+
+def test_private_attributes_and_transaction_are_not_exposed():
+    with pytest.raises(AttributeError):
+        AsyncRepo(ChatRepo()).transaction
+    with pytest.raises(AttributeError):
+        AsyncRepo(ChatRepo())._commit_object
+
+
+def test_awaiting_inside_a_transaction_raises():
+    repo = ChatRepo()
+
+    async def main():
+        with repo.transaction():
+            await AsyncRepo(repo).create_chat(uuid.uuid4(), uuid.uuid4(), "chat", "name")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(main())
@@ -0,0 +1,68 @@
+import uuid
+from datetime import datetime
+
+import pytest
+
+from ai_db_orm.models import ChatMessage
+from ai_db_orm.repos import ChatRepo
+
+
+def _create_tied_messages(repo: ChatRepo, chat_id: uuid.UUID, count: int) -> list[ChatMessage]:
+    created_at = datetime(2024, 1, 1)
+    organization_id = uuid.uuid4()
+    messages = [
+        ChatMessage(
+            organization_id=organization_id,
+            chat_id=chat_id,
+            type="text",
+            content=f"m{i}",
+            arguments={},
+            created_at=created_at,
+        )
+        for i in range(count)
+    ]
+    for message in messages:
+        repo._commit_object(message)
+
+    return sorted(messages, key=lambda message: str(message.message_id))
+
+
+def test_cursor_pages_through_messages_with_the_same_created_at():
+    repo = ChatRepo()
+    chat_id = uuid.uuid4()
+    messages = _create_tied_messages(repo, chat_id, 3)
+    cursor = messages[1]
+
+    older = repo.get_chat_messages(chat_id, before=cursor.created_at, before_id=cursor.message_id)
+
+    assert {message.content for message in older} == {messages[0].content}
+
+
+def test_messages_with_the_same_created_at_come_back_in_message_id_order():
+    repo = ChatRepo()
+    chat_id = uuid.uuid4()
+    messages = _create_tied_messages(repo, chat_id, 5)
+
+    returned = repo.get_chat_messages(chat_id)
+
+    assert [message.content for message in returned] == [message.content for message in messages]
+
+
+def test_pages_cover_tied_messages_without_gaps():
+    repo = ChatRepo()
+    chat_id = uuid.uuid4()
+    messages = _create_tied_messages(repo, chat_id, 45)
+
+    newest = repo.get_chat_messages(chat_id)
+    oldest = repo.get_chat_messages(chat_id, before=newest[0].created_at, before_id=newest[0].message_id)
+
+    assert [message.content for message in oldest + newest] == [message.content for message in messages]
+
+
+def test_cursor_parts_must_be_passed_together():
+    repo = ChatRepo()
+
+    with pytest.raises(ValueError):
+        repo.get_chat_messages(uuid.uuid4(), before=datetime(2024, 1, 1))
+    with pytest.raises(ValueError):
+        repo.get_chat_messages(uuid.uuid4(), before_id=uuid.uuid4())
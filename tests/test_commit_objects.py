@@ -0,0 +1,44 @@
+import uuid
+
+import pytest
+
+from ai_db_orm.models import ChatCollection, ChatResource
+from ai_db_orm.repos import ChatRepo, CollectionRepo, ResourceRepo
+
+
+def test_create_collection_resources_links_every_resource():
+    organization_id = uuid.uuid4()
+    collection = CollectionRepo().create_collection(organization_id)
+    resource_repo = ResourceRepo()
+    resource_ids = [resource_repo.create_resource(organization_id, "file", uuid.uuid4()).resource_id for _ in range(3)]
+
+    links = CollectionRepo().create_collection_resources(collection.collection_id, organization_id, resource_ids)
+
+    assert len(links) == 3
+    resources = resource_repo.get_resources_by_collection_id(collection.collection_id)
+    assert {str(resource.resource_id) for resource in resources} == {str(resource_id) for resource_id in resource_ids}
+
+
+def test_add_resources_to_chat_joins_transaction():
+    repo = ChatRepo()
+    chat_id = uuid.uuid4()
+
+    with pytest.raises(RuntimeError):
+        with repo.transaction():
+            repo.add_resources_to_chat(uuid.uuid4(), chat_id, [uuid.uuid4(), uuid.uuid4()])
+            raise RuntimeError
+
+    assert repo.get_chat_resources(chat_id) == []
+    assert repo.add_resources_to_chat(uuid.uuid4(), chat_id, []) == []
+
+
+def test_commit_objects_rejects_mixed_models():
+    organization_id = uuid.uuid4()
+    chat_id = uuid.uuid4()
+    objs = [
+        ChatResource(organization_id=organization_id, chat_id=chat_id, resource_id=uuid.uuid4()),
+        ChatCollection(organization_id=organization_id, chat_id=chat_id, collection_id=uuid.uuid4()),
+    ]
+
+    with pytest.raises(ValueError):
+        ChatRepo()._commit_objects(objs)
@@ -0,0 +1,68 @@
+import pytest
+from sqlmodel import Session, select
+
+from ai_db_orm.models import OrganizationUser, User
+from ai_db_orm.repos import OrganizationRepo, UserRepo
+
+
+@pytest.fixture(autouse=True)
+def clear_default_ids():
+    UserRepo._default_user_id.cache_clear()
+    OrganizationRepo._default_organization_id.cache_clear()
+    yield
+    UserRepo._default_user_id.cache_clear()
+    OrganizationRepo._default_organization_id.cache_clear()
+
+
+def test_default_user_is_created_once_and_returned_as_fresh_instances():
+    first = UserRepo().get_default_user()
+    second = UserRepo().get_default_user()
+
+    assert first is not second
+    assert str(first.user_id) == str(second.user_id)
+    with Session(UserRepo().engine) as session:
+        assert len(session.exec(select(User)).all()) == 1
+
+
+def test_changing_a_returned_default_user_does_not_leak_to_other_callers():
+    UserRepo().get_default_user().first_name = "changed"
+
+    assert UserRepo().get_default_user().first_name == "Default AI"
+
+
+def test_default_organization_links_the_default_user():
+    organization = OrganizationRepo().get_default_organization()
+    user = UserRepo().get_default_user()
+
+    assert organization.name == "Default AI service org 2"
+    assert OrganizationRepo().get_default_organization() is not organization
+    with Session(OrganizationRepo().engine) as session:
+        organization_users = session.exec(select(OrganizationUser)).all()
+    assert [(str(row.organization_id), str(row.user_id)) for row in organization_users] == [
+        (str(organization.organization_id), str(user.user_id))
+    ]
+
+
+def test_defaults_resolved_inside_a_transaction_are_committed():
+    with UserRepo().transaction():
+        user = UserRepo().get_default_user()
+    with OrganizationRepo().transaction():
+        organization = OrganizationRepo().get_default_organization()
+
+    assert user is not None
+    assert organization is not None
+    assert str(UserRepo().get_default_user().user_id) == str(user.user_id)
+    assert str(OrganizationRepo().get_default_organization().organization_id) == str(organization.organization_id)
+
+
+def test_defaults_survive_a_rolled_back_transaction():
+    with pytest.raises(RuntimeError):
+        with UserRepo().transaction(), OrganizationRepo().transaction():
+            UserRepo().get_default_user()
+            OrganizationRepo().get_default_organization()
+            raise RuntimeError
+
+    assert UserRepo().get_default_user() is not None
+    assert OrganizationRepo().get_default_organization() is not None
+    with Session(OrganizationRepo().engine) as session:
+        assert len(session.exec(select(OrganizationUser)).all()) == 1
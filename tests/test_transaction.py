@@ -0,0 +1,134 @@
+import uuid
+
+import pytest
+from sqlmodel import Session, select
+
+from ai_db_orm.models import Chat, Collection
+from ai_db_orm.repos import ChatRepo, CollectionRepo
+
+
+def _collection_names(repo: CollectionRepo) -> list[str]:
+    with Session(repo.engine) as session:
+        return sorted(collection.name for collection in session.exec(select(Collection)).all())
+
+
+def test_transaction_commits_all_writes():
+    repo = CollectionRepo()
+    organization_id = uuid.uuid4()
+
+    with repo.transaction():
+        repo.create_collection(organization_id, "a")
+        repo.create_collection(organization_id, "b")
+        assert _collection_names(repo) == []
+
+    assert _collection_names(repo) == ["a", "b"]
+
+
+def test_transaction_rolls_back_on_error():
+    repo = CollectionRepo()
+
+    with pytest.raises(RuntimeError):
+        with repo.transaction():
+            repo.create_collection(uuid.uuid4(), "a")
+            raise RuntimeError
+
+    assert _collection_names(repo) == []
+
+
+def test_transaction_joins_only_repos_on_the_same_engine():
+    collection_repo = CollectionRepo()
+    chat_repo = ChatRepo()
+    organization_id = uuid.uuid4()
+
+    with pytest.raises(RuntimeError):
+        with collection_repo.transaction():
+            CollectionRepo().create_collection(organization_id, "joined")
+            chat = chat_repo.create_chat(organization_id, uuid.uuid4(), "chat", "separate")
+            raise RuntimeError
+
+    assert _collection_names(collection_repo) == []
+    with Session(chat_repo.engine) as session:
+        assert session.get(Chat, {"organization_id": organization_id, "chat_id": chat.chat_id}) is not None
+
+
+def test_transaction_nested_on_another_engine_keeps_outer_session():
+    collection_repo = CollectionRepo()
+    chat_repo = ChatRepo()
+    organization_id = uuid.uuid4()
+
+    with pytest.raises(RuntimeError):
+        with collection_repo.transaction() as outer:
+            with chat_repo.transaction() as inner:
+                assert inner is not outer
+                assert collection_repo._get_transaction_session() is outer
+                CollectionRepo().create_collection(organization_id, "outer write in inner block")
+                chat_repo.create_chat(organization_id, uuid.uuid4(), "chat", "inner")
+                raise RuntimeError
+
+    assert _collection_names(collection_repo) == []
+    with Session(chat_repo.engine) as session:
+        assert session.exec(select(Chat)).all() == []
+
+
+def test_transaction_nested_on_another_engine_commits_both():
+    collection_repo = CollectionRepo()
+    chat_repo = ChatRepo()
+    organization_id = uuid.uuid4()
+
+    with collection_repo.transaction():
+        with chat_repo.transaction():
+            collection_repo.create_collection(organization_id, "outer")
+            chat = chat_repo.create_chat(organization_id, uuid.uuid4(), "chat", "inner")
+        assert collection_repo._get_transaction_session() is not None
+        assert chat_repo._get_transaction_session() is None
+
+    assert _collection_names(collection_repo) == ["outer"]
+    assert chat_repo.get_chat(chat.chat_id, organization_id).name == "inner"
+
+
+def test_nested_transaction_joins_outer():
+    repo = CollectionRepo()
+    organization_id = uuid.uuid4()
+
+    with repo.transaction() as outer:
+        with repo.transaction() as inner:
+            assert inner is outer
+            repo.create_collection(organization_id, "inner")
+        assert _collection_names(repo) == []
+
+    assert _collection_names(repo) == ["inner"]
+
+
+def test_nested_transaction_error_rolls_back_outer():
+    repo = CollectionRepo()
+
+    with pytest.raises(RuntimeError):
+        with repo.transaction():
+            repo.create_collection(uuid.uuid4(), "outer")
+            with repo.transaction():
+                raise RuntimeError
+
+    assert _collection_names(repo) == []
+
+
+def test_commit_object_refreshes_inside_transaction():
+    repo = CollectionRepo()
+    collection = Collection(organization_id=uuid.uuid4(), name="refreshed")
+
+    with repo.transaction() as session:
+        repo._commit_object(collection, refresh=True)
+        assert collection in session
+        assert not session.new
+
+    assert _collection_names(repo) == ["refreshed"]
+
+
+def test_update_inside_transaction_is_committed_with_it():
+    repo = ChatRepo()
+    chat = repo.create_chat(uuid.uuid4(), uuid.uuid4(), "chat", "old")
+
+    with repo.transaction():
+        updated = repo.update_chat_name(chat.chat_id, "new")
+        assert updated.name == "new"
+
+    assert repo.get_chat(chat.chat_id, chat.organization_id).name == "new"
@@ -0,0 +1,52 @@
+import uuid
+from datetime import datetime
+
+from ai_db_orm import models
+from ai_db_orm.models import now, transaction_clock
+from ai_db_orm.repos import ChatRepo, CollectionRepo
+
+# A transaction timestamp no real clock read can produce, so rows that took it are told apart without
+# relying on the clock's resolution.
+PINNED = datetime(2000, 1, 1)
+
+
+def test_now_is_frozen_inside_transaction_clock():
+    with transaction_clock() as timestamp:
+        assert now() == timestamp
+    assert models._transaction_now.get() is None
+
+
+def test_rows_in_one_transaction_share_created_at():
+    repo = CollectionRepo()
+    organization_id = uuid.uuid4()
+
+    with repo.transaction():
+        models._transaction_now.set(PINNED)
+        first = repo.create_collection(organization_id, "first")
+        second = repo.create_collection(organization_id, "second")
+
+    assert first.created_at == second.created_at == PINNED
+    assert repo.create_collection(organization_id, "later").created_at != PINNED
+
+
+def test_chat_messages_in_one_transaction_keep_write_order():
+    repo = ChatRepo()
+    organization_id = uuid.uuid4()
+    chat = repo.create_chat(organization_id, uuid.uuid4(), "chat", "name")
+
+    with repo.transaction():
+        models._transaction_now.set(PINNED)
+        for i in range(5):
+            repo.create_chat_message(organization_id, chat.chat_id, "text", f"m{i}")
+
+    messages = repo.get_chat_messages(chat.chat_id)
+    assert sorted(message.content for message in messages) == ["m0", "m1", "m2", "m3", "m4"]
+    assert all(message.created_at != PINNED for message in messages)
+    # Write order holds wherever the clock moved between messages; equal timestamps fall back to message_id.
+    assert messages == sorted(messages, key=lambda message: (message.created_at, str(message.message_id)))
+    for earlier, later in zip(messages, messages[1:]):
+        if earlier.created_at != later.created_at:
+            assert earlier.content < later.content
+
+    older = repo.get_chat_messages(chat.chat_id, before=messages[2].created_at, before_id=messages[2].message_id)
+    assert [message.content for message in older] == [message.content for message in messages[:2]]
@@ -0,0 +1,74 @@
+import os
+import select
+import signal
+import threading
+
+import pytest
+
+from ai_db_orm.models import _UUIDPool, _uuid_pool, generate_uuid
+
+
+def test_generated_ids_are_unique_version_4_uuids():
+    ids = [generate_uuid() for _ in range(1000)]
+
+    assert len(set(ids)) == 1000
+    assert {uuid.version for uuid in ids} == {4}
+
+
+def test_concurrent_callers_never_share_an_id():
+    pool = _UUIDPool(size=8)
+    ids = []
+
+    def take():
+        ids.extend(pool.next() for _ in range(100))
+
+    threads = [threading.Thread(target=take) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(ids) == len(set(ids)) == 800
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_child_does_not_reuse_the_parent_pool():
+    generate_uuid()
+    pending = set(_uuid_pool._uuids)
+    read_fd, write_fd = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        os.write(write_fd, str(generate_uuid()).encode())
+        os._exit(0)
+
+    os.close(write_fd)
+    child_id = os.read(read_fd, 64).decode()
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+
+    assert child_id not in {str(uuid) for uuid in pending}
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_child_can_refill_while_parent_holds_the_lock():
+    read_fd, write_fd = os.pipe()
+
+    with _uuid_pool._lock:
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            _uuid_pool._uuids.clear()
+            os.write(write_fd, str(generate_uuid()).encode())
+            os._exit(0)
+
+    os.close(write_fd)
+    ready, _, _ = select.select([read_fd], [], [], 5)
+    child_id = os.read(read_fd, 64).decode() if ready else ""
+    os.close(read_fd)
+    if not ready:
+        os.kill(pid, signal.SIGKILL)
+    os.waitpid(pid, 0)
+
+    assert len(child_id) == 36